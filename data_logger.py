@@ -31,13 +31,17 @@ from itertools import chain
 from types import TracebackType
 from typing import Self, cast
 
+import uvloop
 import yaml
 
 from _version import __version__
+from errors import EndpointError
 from factories import device_factory, endpoint_factory
 from logger.logger import DataEvent
 
 DEFAULT_WAIT_TIMEOUT = 10  # in seconds
+QUEUE_WARNING_LEVEL = 0.8  # Warn if an endpoint queue is filled beyond this fraction of its size
+QUEUE_WARNING_INTERVAL = 60  # in seconds, the minimum time between two warnings about the same endpoint queue
 LOG_LEVEL = logging.INFO
 ERROR_LOG_FMT = "%(asctime)s %(name)-12s %(levelname)-8s %(message)s"
 
@@ -153,9 +157,28 @@ class LoggingDaemon:
                     *[self.__endpoints["file"].write(line for line in await data_generator.get_header())]
                 )
 
+            endpoints = list(zip(self.__endpoints, self.__endpoints.values(), endpoint_queues))
+            dropped_measurements = dict.fromkeys(self.__endpoints, 0)
+            last_warning = dict.fromkeys(self.__endpoints, float("-inf"))
+            loop = asyncio.get_running_loop()
             async for timestamp, data in data_generator.read_sensors(self.__time_interval):
-                for queue in endpoint_queues:
-                    queue.put_nowait((timestamp, data))
+                for name, endpoint, queue in endpoints:
+                    # Endpoints, that do not drop measurements, apply back-pressure and the sensors wait for them
+                    if not await endpoint.put((timestamp, data)):
+                        dropped_measurements[name] += 1
+
+                    if (
+                        0 < queue.maxsize * QUEUE_WARNING_LEVEL < queue.qsize()
+                        and loop.time() - last_warning[name] >= QUEUE_WARNING_INTERVAL
+                    ):
+                        last_warning[name] = loop.time()
+                        self.__logger.warning(
+                            "Queue of endpoint '%s' is filling up (%d/%d). Dropped %d measurement(s) so far.",
+                            name,
+                            queue.qsize(),
+                            queue.maxsize,
+                            dropped_measurements[name],
+                        )
                 self.__logger.info(",".join(map(str, data)))
 
     async def run(self):
@@ -169,6 +192,9 @@ class LoggingDaemon:
                 await main_task
             except ConnectionError as exc:
                 self.__logger.error("Connection error: %s. Reconnecting", exc)
+            except EndpointError:
+                self.__logger.exception("Endpoint failure. Shutting down.")
+                raise
             except asyncio.CancelledError:
                 self.__logger.info("Logging daemon shut down.")
                 raise
@@ -229,7 +255,7 @@ try:
         time_interval=0,
     )
 
-    asyncio.run(logging_daemon.run(), debug=False)
+    uvloop.run(logging_daemon.run(), debug=False)
 except KeyboardInterrupt:
     # The loop will be canceled on a KeyboardInterrupt by the run() method, we
     # just want to suppress the exception
@@ -14,6 +14,7 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import socket
 
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
@@ -58,7 +59,8 @@ class AsyncEthernet:
                 coro = self.__reader.readuntil(self.__separator)
             else:
                 coro = self.__reader.readexactly(length)
-            data = await asyncio.wait_for(coro, timeout=self.__timeout if timeout is None else timeout)
+            async with asyncio.timeout(self.__timeout if timeout is None else timeout):
+                data = await coro
             return data
         else:
             raise NotConnectedError(f"Cannot read from {self.__host[0]}:{self.__host[1]}. Not connected.")
@@ -66,16 +68,27 @@ class AsyncEthernet:
     async def write(self, cmd, timeout: float | None = None):
         if self.is_connected:
             self.__writer.write(cmd)
-            await asyncio.wait_for(self.__writer.drain(), timeout=self.__timeout if timeout is None else timeout)
+            async with asyncio.timeout(self.__timeout if timeout is None else timeout):
+                await self.__writer.drain()
         else:
             raise NotConnectedError(f"Cannot write to {self.__host[0]}:{self.__host[1]}. Not connected.")
 
     async def connect(self):
         if not self.is_connected:
             host, port = self.__host
-            self.__reader, self.__writer = await asyncio.wait_for(
-                asyncio.open_connection(host=host, port=port, **self.__kwargs), timeout=self.__timeout
-            )
+            async with asyncio.timeout(self.__timeout):
+                self.__reader, self.__writer = await asyncio.open_connection(host=host, port=port, **self.__kwargs)
+            sock = self.__writer.get_extra_info("socket")
+            if sock is not None:
+                # SCPI commands are tiny, so do not let Nagle's algorithm delay them
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                # Detect instruments, that were switched off without closing the connection. The OS defaults only
+                # probe after hours of silence, so shorten them to drop a dead connection after about 25 s.
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                if hasattr(socket, "TCP_KEEPIDLE"):  # Not available on all platforms
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 10)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 5)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
             self.__logger.info("Ethernet connection established to '%s:%d'", host, port)
 
     async def disconnect(self):
@@ -70,7 +70,8 @@ class AsyncSerial:
                 coro = self.__reader.readuntil(self.__separator)
             else:
                 coro = self.__reader.readexactly(length)
-            data = await asyncio.wait_for(coro, timeout=self.__timeout)
+            async with asyncio.timeout(self.__timeout):
+                data = await coro
             return data.decode("utf-8")
         else:
             # TODO: raise custom error
@@ -79,7 +80,8 @@ class AsyncSerial:
     async def write(self, cmd):
         if self.is_connected:
             self.__writer.write(cmd.encode())
-            await asyncio.wait_for(self.__writer.drain(), timeout=self.__timeout)
+            async with asyncio.timeout(self.__timeout):
+                await self.__writer.drain()
         else:
             # TODO: raise custom error
             pass
@@ -87,9 +89,10 @@ class AsyncSerial:
     async def connect(self):
         if not self.is_connected:
             self.__lock = asyncio.Lock()
-            self.__reader, self.__writer = await asyncio.wait_for(
-                serial_asyncio.open_serial_connection(url=self.__tty, **self.__kwargs), timeout=self.__timeout
-            )
+            async with asyncio.timeout(self.__timeout):
+                self.__reader, self.__writer = await serial_asyncio.open_serial_connection(
+                    url=self.__tty, **self.__kwargs
+                )
 
             self.__writer.transport.serial.reset_input_buffer()
             self.__logger.info("Serial connection established to '%s'", self.__tty)
@@ -71,11 +71,10 @@ class Keithley2002:
     def __init__(self, connection) -> None:
         self.__conn = connection
         self.__logger = logging.getLogger(__name__)
+        self.__lock: asyncio.Lock | None = None
 
     async def get_id(self) -> str:
-        # Catch AttributeError if not connected
-        await self.write("*IDN?", test_error=False)
-        return await self.read()
+        return await self.query("*IDN?")
 
     async def get_cal_data(self) -> tuple[datetime, datetime]:
         cal_date_str = await self.query(":CALibration:PROTected:DATE?")
@@ -112,15 +111,19 @@ class Keithley2002:
             return (await self.__conn.read(length=length + 1))[:-1]
 
     async def query(self, cmd: str, length: int | None = None) -> str:
-        await self.write(cmd, test_error=False)
-        result = await self.read(length)
-        return result
+        if self.__lock is None:
+            raise ConnectionError("Not connected.")
+        async with self.__lock:  # The answer must be read before the next query is sent
+            await self.write(cmd, test_error=False)
+            result = await self.read(length)
+            return result
 
     async def serial_poll(self) -> None:
         return await self.__conn.serial_poll()
 
     async def connect(self) -> None:
         await self.__conn.connect()
+        self.__lock = asyncio.Lock()
 
     async def disconnect(self) -> None:
         await self.__conn.disconnect()
@@ -129,9 +132,11 @@ class Keithley2002:
 class Keithley26xxB:
     def __init__(self, connection) -> None:
         self.__conn = connection
+        self.__lock: asyncio.Lock | None = None
 
     async def connect(self) -> None:
         await self.__conn.connect()
+        self.__lock = asyncio.Lock()
         try:
             await asyncio.wait_for(self.read(), timeout=0.1)  # 100ms timeout
         except asyncio.TimeoutError:
@@ -174,8 +179,11 @@ class Keithley26xxB:
             return (await self.__conn.read(length=length + 1))[:-1]
 
     async def query(self, cmd: str, length: int | None = None) -> str:
-        await self.write(cmd)
-        return await self.__read(length)
+        if self.__lock is None:
+            raise ConnectionError("Not connected.")
+        async with self.__lock:
+            await self.write(cmd)
+            return await self.__read(length)
 
     async def read(self) -> str | None:
         try:
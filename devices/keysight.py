@@ -27,12 +27,12 @@ from devices.async_ethernet import AsyncEthernet
 class Hp3458A:
     def __init__(self, connection) -> None:
         self.__conn = connection
+        self.__lock: asyncio.Lock | None = None
 
         self.__logger = logging.getLogger(__name__)
 
     async def get_id(self) -> str:
-        await self.write("ID?")
-        return await self.read()
+        return await self.query("ID?")
 
     async def write(self, cmd: str) -> None:
         self.__logger.debug("Writing: %s", cmd)
@@ -42,8 +42,11 @@ class Hp3458A:
         return (await self.__conn.read()).strip().decode("utf-8")
 
     async def query(self, cmd: str) -> str:
-        await self.write(cmd)
-        return await self.read()
+        if self.__lock is None:
+            raise ConnectionError("Not connected.")
+        async with self.__lock:
+            await self.write(cmd)
+            return await self.read()
 
     async def beep(self) -> None:
         await self.write("BEEP")
@@ -88,7 +91,7 @@ class Hp3458A:
             raise ValueError(f"Could not convert {result} to Decimal") from exc
 
     async def get_temperature_acal_dcv(self) -> Decimal:
-        result = Decimal(await self.query("CAL? 175"))
+        result = await self.query("CAL? 175")
 
         try:
             return Decimal(result)
@@ -96,7 +99,7 @@ class Hp3458A:
             raise ValueError(f"Could not convert {result} to Decimal") from exc
 
     async def get_temperature(self) -> Decimal:
-        result = Decimal(await self.query("TEMP?"))
+        result = await self.query("TEMP?")
 
         try:
             return Decimal(result)
@@ -106,6 +109,7 @@ class Hp3458A:
     async def connect(self) -> None:
         self.__logger.debug("Connecting to HP3458A.")
         await self.__conn.connect()
+        self.__lock = asyncio.Lock()
         await self.write("END ALWAYS; TARM HOLD")  # Recommended during setup as per manual p. 51
         self.__logger.debug("Connected to HP3458A.")
 
@@ -116,12 +120,14 @@ class Hp3458A:
 class Keysight34470A:
     def __init__(self, connection: AsyncEthernet) -> None:
         self.__conn = connection
+        self.__lock: asyncio.Lock | None = None
 
         self.__logger = logging.getLogger(__name__)
 
     async def connect(self) -> None:
         self.__logger.debug("Connecting to Keysight 34470A.")
         await self.__conn.connect()
+        self.__lock = asyncio.Lock()
         await self.write(":ABORt")
         try:
             await asyncio.wait_for(self.read(), timeout=0.1)  # 100ms timeout
@@ -143,11 +149,13 @@ class Keysight34470A:
             return (await self.__conn.read(length=length + 1, **kwargs))[:-1]
 
     async def query(self, cmd: str, **kwargs) -> str:
-        await self.write(cmd)
-        return await self.__read(**kwargs)
+        if self.__lock is None:
+            raise ConnectionError("Not connected.")
+        async with self.__lock:
+            await self.write(cmd)
+            return await self.__read(**kwargs)
 
     async def get_id(self) -> str:
-        # Catch AttributeError if not connected
         return await self.query("*IDN?")
 
     async def beep(self) -> None:
@@ -167,7 +175,7 @@ class Keysight34470A:
     async def get_cal_data(self) -> tuple[datetime, Decimal, str]:
         cal_date_str = f"{await self.query('CALibration:DATE?')} {await self.query('CALibration:TIME?')}"
         cal_datetime = datetime.strptime(cal_date_str, "+%Y,+%m,+%d %H,%M,%S.%f").replace(tzinfo=timezone.utc)
-        cal_temperature = Decimal(await self.query("CALibration:TEMPerature?"))
+        cal_temperature = await self.query("CALibration:TEMPerature?")
         cal_str = await self.query("CALibration:STRing?")
 
         try:
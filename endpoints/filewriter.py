@@ -3,13 +3,14 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from types import TracebackType
-
-import aiofiles
-from aiofiles.threadpool.text import AsyncTextIOWrapper
+from typing import Any, TextIO
 
 from _version import __version__
+from endpoints.queueing import put_while_running
 from logger.logger import DataEvent
 
 
@@ -24,37 +25,38 @@ class Filewriter:
         """
         return "file"
 
-    def __init__(self, filename: str, descriptor: str) -> None:
+    def __init__(self, filename: str, descriptor: str, max_queue_size: int = 10_000) -> None:
         # drop the microseconds
         date = datetime.now(timezone.utc).replace(microsecond=0)
         self.__filename = filename.format(date=date.isoformat("_"))
         self.__file_descriptor = descriptor
         self.__logger = logging.getLogger(__name__)
-        self.__filehandle: AsyncTextIOWrapper | None = None
-        self.__write_queue: asyncio.Queue[tuple[datetime, tuple[DataEvent, ...]]] = asyncio.Queue()
-        self.__running_tasks: set[asyncio.Task] = set()
+        self.__filehandle: TextIO | None = None
+        self.__executor: ThreadPoolExecutor | None = None
+        self.__write_queue: asyncio.Queue[tuple[datetime, tuple[DataEvent, ...]]] = asyncio.Queue(
+            maxsize=int(max_queue_size)
+        )
+        self.__writer_task: asyncio.Task | None = None
 
     async def __aenter__(self) -> asyncio.Queue:
         self.__logger.info("Initializing file writer")
-        # Check if the directory exists, else create it, unless there is no directory specified
-        if not os.path.exists(os.path.dirname(self.__filename)) and os.path.dirname(self.__filename):
-            os.makedirs(os.path.dirname(self.__filename))
-        # Open file, buffering=1 means line buffering
-        self.__filehandle = await aiofiles.open(self.__filename, mode="a+", buffering=1)
+        # A single thread does all file operations, so the writes are guaranteed to be in order
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Filewriter")
+        self.__filehandle = await self.__run_in_executor(self.__open_file)
         self.__logger.info("File '%s' opened.", self.__filename)
 
         # Write header
-        await self.__filehandle.write(
+        await self.__run_in_executor(
+            self.__write_and_flush,
             (
                 "# This file was generated using the Python data logger"
                 f" script v{__version__}.\n"
                 "# Check https://github.com/PatrickBaus/data_logger for the latest version.\n"
                 f"# {self.__file_descriptor}\n"
-            )
+            ),
         )
 
-        task = asyncio.create_task(self._queue_writer())
-        self.__running_tasks.add(task)
+        self.__writer_task = asyncio.create_task(self._queue_writer())
 
         return self.__write_queue
 
@@ -70,32 +72,102 @@ class Filewriter:
             except asyncio.TimeoutError:
                 self.__logger.error("Timeout while flushing the file writer.")
 
-            # Stop running tasks
-            for task in self.__running_tasks:
-                task.cancel()
-            results = await asyncio.gather(*self.__running_tasks, self.__filehandle.close(), return_exceptions=True)
+            # Stop the writer, it is always running while the file is open
+            assert self.__writer_task is not None
+            self.__writer_task.cancel()
+            results = await asyncio.gather(self.__writer_task, return_exceptions=True)
+            self.__writer_task = None
             for result in results:
                 if isinstance(result, Exception):
                     self.__logger.error("Error during shutdown of the file writer", exc_info=result)
 
             self.__logger.debug("Closing open file handles.")
             try:
-                await self.__filehandle.close()
+                await self.__run_in_executor(self.__filehandle.close)
             finally:
                 self.__filehandle = None
+                if self.__executor is not None:
+                    self.__executor.shutdown()
+                    self.__executor = None
             self.__logger.info("File '%s' closed.", self.__filename)
 
+    async def put(self, item: tuple[datetime, tuple[DataEvent, ...]]) -> bool:
+        """
+        Queue a row to be written. The file is the primary record, so rows are never dropped. If the queue is full,
+        this waits until the writer has caught up.
+
+        Parameters
+        ----------
+        item: tuple of datetime and tuple of DataEvent
+            The timestamp and the measurements of the row
+
+        Returns
+        -------
+        bool
+            Always True, because the row is never dropped
+
+        Raises
+        ------
+        EndpointError
+            Raised if the writer has stopped, for example because the disk is full
+        """
+        assert self.__writer_task is not None
+        await put_while_running(self.__write_queue, self.__writer_task, item, "file writer")
+        return True
+
+    async def __run_in_executor(self, func: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, func, *args)
+
+    def __open_file(self) -> TextIO:
+        # Runs in the executor thread, so that creating the directory and opening the file only takes a single hop
+        dirname = os.path.dirname(self.__filename)
+        if dirname:  # Create the directory, unless there is no directory specified
+            os.makedirs(dirname, exist_ok=True)
+        # Open file with a large buffer, the writer flushes the buffer after each batch of lines
+        return open(self.__filename, mode="a+", buffering=1 << 16, encoding="utf-8")
+
+    def __write_and_flush(self, data: str) -> None:
+        # Runs in the executor thread, so that writing and flushing only takes a single thread hop
+        assert self.__filehandle is not None
+        self.__filehandle.write(data)
+        self.__filehandle.flush()
+
     async def write(self, lines):
-        for line in lines:
-            await self.__filehandle.write(line)
+        await self.__run_in_executor(self.__write_and_flush, "".join(lines))
+
+    @staticmethod
+    def _format_line(timestamp: datetime, items: tuple[DataEvent, ...]) -> str:
+        """
+        Format a single row of the log file.
+
+        Parameters
+        ----------
+        timestamp: datetime
+            The time of the measurement
+        items: tuple of DataEvent
+            The measurements taken at `timestamp`
+
+        Returns
+        -------
+        str
+            A comma separated line including the line terminator
+        """
+        return f"{timestamp},{','.join(map(str, items))}\n"
 
     async def _queue_writer(self) -> None:
         assert self.__filehandle is not None  # Cannot change later as the queue will be joined first
         while "queue not joined":
+            batch_size = 0
             try:
                 timestamp, items = await self.__write_queue.get()
-                await self.__filehandle.write(f"{timestamp},{','.join(map(str, items))}\n")
-                self.__write_queue.task_done()
-            except Exception:
-                self.__write_queue.task_done()
-                raise
+                batch_size += 1
+                lines = [self._format_line(timestamp, items)]
+                # Drain the queue to write everything that piled up during the previous write in one go
+                while not self.__write_queue.empty():
+                    timestamp, items = self.__write_queue.get_nowait()
+                    batch_size += 1
+                    lines.append(self._format_line(timestamp, items))
+                await self.__run_in_executor(self.__write_and_flush, "".join(lines))
+            finally:
+                for _ in range(batch_size):
+                    self.__write_queue.task_done()
@@ -6,25 +6,72 @@ from __future__ import annotations
 
 import asyncio
 import datetime
+import functools
 import itertools
 import logging
 import re
+from collections import deque
+from decimal import Decimal
 from types import TracebackType
+from typing import Any
+from uuid import UUID
 
 import aiomqtt
-import simplejson as json
+import orjson
 from pydantic import BaseModel, field_validator
 
+from endpoints.queueing import put_while_running, raise_if_stopped
 from logger.logger import DataEvent
 
 # A regular expression to match a hostname with an optional port.
 # It adheres to RFC 1035 (https://www.rfc-editor.org/rfc/rfc1035) and matches ports
 # between 0-65535.
-HOSTNAME_REGEX = (
+HOSTNAME_REGEX = re.compile(
     r"^((?=.{1,255}$)[0-9A-Za-z](?:(?:[0-9A-Za-z]|-){0,61}[0-9A-Za-z])?(?:\.[0-9A-Za-z](?:(?:["
     r"0-9A-Za-z]|-){0,61}[0-9A-Za-z])?)*\.?)(?:\:([0-9]{1,4}|[1-5][0-9]{4}|6[0-4][0-9]{3}|65[0-4][0-9]{"
     r"2}|655[0-2][0-9]|6553[0-5]))?$"
 )
+# Extracts the error number from the string representation of an OSError
+ERRNO_REGEX = re.compile(r"\[Errno (\d+)]")
+
+
+def _json_default(obj: Any) -> Any:
+    """
+    Serialize the types, that are not natively supported by orjson.
+    """
+    if isinstance(obj, Decimal):
+        if not obj.is_finite():
+            # JSON has no NaN or Infinity, write null like orjson does for non-finite floats
+            return None
+        # Decimals are written as JSON numbers to retain their full precision
+        return orjson.Fragment(str(obj))
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+@functools.lru_cache(maxsize=1024)
+def _json_template(sender: UUID, sid: int, unit: str) -> tuple[bytes, bytes]:
+    """
+    Returns the static parts of the JSON payload of a sensor. These do not change between measurements, so they only
+    need to be serialized once.
+
+    Parameters
+    ----------
+    sender: UUID
+        The uuid of the sensor
+    sid: int
+        The id of the sensor channel
+    unit: str
+        The unit of the measurement
+
+    Returns
+    -------
+    tuple of bytes and bytes
+        The part between the timestamp and the value and the part following the value
+    """
+    return (
+        b',"uuid":' + orjson.dumps(str(sender)) + b',"sid":' + orjson.dumps(sid) + b',"value":',
+        b',"unit":' + orjson.dumps(unit) + b"}",
+    )
 
 
 class MQTTParams(BaseModel):
@@ -65,7 +112,7 @@ class MQTTParams(BaseModel):
         result = []
         for host in hosts:
             host = host.strip()
-            match = re.search(HOSTNAME_REGEX, host)
+            match = HOSTNAME_REGEX.search(host)
             if match is None:
                 raise ValueError(f"'{value}' is not a valid hostname or list of hostnames.")
             result.append(
@@ -77,7 +124,7 @@ class MQTTParams(BaseModel):
         return result
 
 
-class MqttWriter:
+class MqttWriter:  # pylint: disable=too-many-instance-attributes
     """
     Consumer takes data and writes it to an MQTT broker as JSON dict.
     """
@@ -92,36 +139,84 @@ class MqttWriter:
         """
         return "mqtt"
 
-    def __init__(self, hosts: str, username: str | None, password: str | None, number_of_workers: int = 5) -> None:
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        hosts: str,
+        username: str | None,
+        password: str | None,
+        number_of_workers: int = 5,
+        max_queue_size: int = 10_000,
+        qos: int = 2,
+        qos_map: dict[str, int] | None = None,
+        drop_on_full: bool = True,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        hosts: str
+            Either a single hostname:port string or a comma separated list of hostname:port strings.
+        username: str or None
+            The username used for authentication. Set to None if no username is required
+        password: str or None
+            The password used for authentication. Set to None if no username is required
+        number_of_workers: int, default=5
+            The number of measurements published concurrently
+        max_queue_size: int, default=10000
+            The maximum number of measurements queued. Set to 0 for an unbounded queue.
+        qos: int, default=2
+            The MQTT quality of service level used, unless the topic matches a filter in `qos_map`
+        qos_map: dict of str and int, optional
+            A mapping of topic filters (wildcards are allowed) to QoS levels. High-rate topics can be published with a
+            lower QoS level to save round-trips. The first filter matching a topic is used.
+        drop_on_full: bool, default=True
+            If True, measurements are dropped (and counted) while the queue is full. This keeps a broker outage from
+            blocking the sensors and in turn the other endpoints. If False, the sensors wait until the broker catches
+            up.
+        """
         self.__mqtt_params = MQTTParams(
             hosts=hosts,
             username=username,
             password=password,
         )
         self.__number_of_workers = int(number_of_workers)
-        self.__write_queue: asyncio.Queue[tuple[datetime.datetime, tuple[DataEvent, ...]]] = asyncio.Queue()
-        self.__running_tasks: set[asyncio.Task] = set()
+        self.__write_queue: asyncio.Queue[tuple[datetime.datetime, tuple[DataEvent, ...]]] = asyncio.Queue(
+            maxsize=int(max_queue_size)
+        )
+        self.__drop_on_full = bool(drop_on_full)
+        # Measurements taken from the queue, that could not be published before the connection was lost
+        self.__unpublished: deque[tuple[datetime.datetime, tuple[DataEvent, ...]]] = deque()
+        self.__consumer_task: asyncio.Task | None = None
+        self.__qos_map = {} if qos_map is None else dict(qos_map)
+        # The catch-all filter of the default QoS level goes last, so that it is only used if nothing else matches. A
+        # catch-all filter given by the user takes precedence.
+        self.__qos_map.setdefault("#", qos)
+        for topic_filter, qos_level in self.__qos_map.items():
+            try:
+                aiomqtt.Wildcard(topic_filter)
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f"Invalid topic filter '{topic_filter}' in the QoS map.") from exc
+            if qos_level not in (0, 1, 2):
+                raise ValueError(f"Invalid QoS level {qos_level} for topic '{topic_filter}'.")
+        self.__topic_qos: dict[str, int] = {}
+        # The last error of the connection, 0 = success. Shared by the consumer and the publishers.
+        self.__error_code = 0
         self.__logger = logging.getLogger(__name__)
 
     @staticmethod
     def _convert_to_json(timestamp: datetime.datetime, event: DataEvent):
-        payload = {
-            "timestamp": timestamp.timestamp(),
-            "uuid": str(event.sender),
-            "sid": event.sid,
-            "value": event.value,
-            "unit": event.unit,
-        }
-        return event.topic, json.dumps(payload, use_decimal=True)
+        infix, suffix = _json_template(event.sender, event.sid, event.unit)
+        value = orjson.dumps(event.value, default=_json_default)
+        return event.topic, b'{"timestamp":' + orjson.dumps(timestamp.timestamp()) + infix + value + suffix
 
     @staticmethod
-    def _calculate_timeout(last_reconnect_attempt: float, reconnect_interval: float) -> float:
+    def _calculate_timeout(last_reconnect_attempt: float, reconnect_interval: float, now: float) -> float:
         """
         Calculates the time to wait between reconnect attempts.
         Parameters
         ----------
         last_reconnect_attempt: A timestamp in seconds
         reconnect_interval: The reconnect interval in seconds
+        now: The current time of the event loop in seconds
 
         Returns
         -------
@@ -130,32 +225,124 @@ class MqttWriter:
         """
         return max(
             0.0,
-            reconnect_interval - (asyncio.get_running_loop().time() - last_reconnect_attempt),
+            reconnect_interval - (now - last_reconnect_attempt),
         )
 
-    async def _consumer(self, reconnect_interval: int = 5) -> None:  # pylint: disable=too-many-branches
+    def _get_qos(self, topic: str) -> int:
+        """
+        Returns the QoS level of a topic. The result is cached, because the topics of a sensor never change.
+
+        Parameters
+        ----------
+        topic: str
+            The topic to publish to
+
+        Returns
+        -------
+        int
+            The QoS level of the first filter in the QoS map, that matches the topic
+        """
+        qos = self.__topic_qos.get(topic)
+        if qos is None:
+            mqtt_topic = aiomqtt.Topic(topic)
+            qos = next(qos for topic_filter, qos in self.__qos_map.items() if mqtt_topic.matches(topic_filter))
+            self.__topic_qos[topic] = qos
+        return qos
+
+    async def _publish(self, mqtt_client: aiomqtt.Client, payloads: list[tuple[str, bytes]]) -> None:
+        """
+        Publishes all payloads concurrently, so that the QoS handshakes of the messages overlap. Raises the first
+        error encountered after all messages have been processed.
+
+        Parameters
+        ----------
+        mqtt_client: aiomqtt.Client
+            The connected client
+        payloads: list of tuple of str and bytes
+            A list of (topic, payload) tuples
+        """
+        results = await asyncio.gather(
+            *[mqtt_client.publish(topic, payload=payload, qos=self._get_qos(topic)) for topic, payload in payloads],
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _publisher(self, mqtt_client: aiomqtt.Client) -> None:
+        """
+        Takes measurements from the input queue and publishes them using the shared client. This coroutine only
+        returns by raising an error. Measurements, that could not be published, are kept and will be published after
+        reconnecting.
+
+        Parameters
+        ----------
+        mqtt_client: aiomqtt.Client
+            The connected client
+        """
+        while "queue not done":
+            # Publish the measurements left over from a lost connection first
+            item = self.__unpublished.popleft() if self.__unpublished else await self.__write_queue.get()
+            try:
+                timestamp, events = item
+                payloads = [self._convert_to_json(timestamp, event) for event in events]
+            except TypeError:
+                self.__logger.exception("Error while serializing DataEvent: %s.", item)
+                self.__write_queue.task_done()  # Drop the event
+                continue
+            try:
+                await self._publish(mqtt_client, payloads)
+            except BaseException:
+                self.__unpublished.append(item)
+                raise
+            self.__write_queue.task_done()
+            self.__error_code = 0  # 0 = success
+
+    async def _run_publishers(self, mqtt_client: aiomqtt.Client) -> None:
+        """
+        Runs the publishers on a shared connection until the first one fails, then stops the others and raises the
+        error.
+
+        Parameters
+        ----------
+        mqtt_client: aiomqtt.Client
+            The connected client
+        """
+        publishers = [asyncio.create_task(self._publisher(mqtt_client)) for _ in range(self.__number_of_workers)]
+        try:
+            done, _ = await asyncio.wait(publishers, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in publishers:
+                task.cancel()
+            await asyncio.gather(*publishers, return_exceptions=True)
+        for task in done:
+            exc = task.exception()
+            if exc is not None:
+                raise exc
+
+    async def _consumer(self, reconnect_interval: int = 5) -> None:
         """
         Pushes the data from the input queue to the MQTT broker. It will make sure,
-        that no data is lost if the MQTT broker disconnects.
+        that no data is lost if the MQTT broker disconnects. All publishers share a
+        single connection to the broker.
 
         Parameters
         ----------
         reconnect_interval: int, default=5
             The time in seconds to wait between connection attempts.
         """
-        error_code = 0  # 0 = success
-        item: tuple[datetime.datetime, tuple[DataEvent, ...]] | None = None
-        last_reconnect_attempt = asyncio.get_running_loop().time() - reconnect_interval
+        loop = asyncio.get_running_loop()
+        last_reconnect_attempt = loop.time() - reconnect_interval
         for host in itertools.cycle(self.__mqtt_params.hosts):
             # Wait for at least reconnect_interval before connecting again
-            timeout = self._calculate_timeout(last_reconnect_attempt, reconnect_interval)
+            timeout = self._calculate_timeout(last_reconnect_attempt, reconnect_interval, loop.time())
             if timeout > 0:
                 self.__logger.info("Delaying reconnect by %.0f s.", timeout)
             await asyncio.sleep(timeout)
-            last_reconnect_attempt = asyncio.get_running_loop().time()
+            last_reconnect_attempt = loop.time()
             try:
                 self.__logger.info(
-                    "Connecting worker to MQTT broker (%s:%i).",
+                    "Connecting to MQTT broker (%s:%i).",
                     *host,
                 )
                 async with aiomqtt.Client(
@@ -163,28 +350,11 @@ class MqttWriter:
                     port=host[1],
                     **self.__mqtt_params.model_dump(exclude={"hosts"}),
                 ) as mqtt_client:
-                    while "queue not done":
-                        if item is None:
-                            # only get new data if we have pushed everything to the broker
-                            item = await self.__write_queue.get()
-                        try:
-                            timestamp, events = item
-                            payloads = [self._convert_to_json(timestamp, event) for event in events]
-                        except TypeError:
-                            self.__logger.exception("Error while serializing DataEvent: %s.", item)
-                            item = None  # Drop the event
-                            self.__write_queue.task_done()
-                        else:
-                            for topic, payload in payloads:
-                                # self.__logger.info("Going to publish: %s to %s", payload, topic)
-                                await mqtt_client.publish(topic, payload=payload, qos=2)
-                            item = None  # Get a new event to publish
-                            self.__write_queue.task_done()
-                            error_code = 0  # 0 = success
+                    await self._run_publishers(mqtt_client)
             except aiomqtt.MqttCodeError as exc:
                 # Only log an error once
-                if error_code != exc.rc:
-                    error_code = exc.rc
+                if self.__error_code != exc.rc:
+                    self.__error_code = exc.rc
                     self.__logger.error("MQTT error: %s. Retrying.", exc)
             except ConnectionRefusedError:
                 self.__logger.error(
@@ -192,15 +362,15 @@ class MqttWriter:
                     *host,
                 )
             except aiomqtt.MqttError as exc:
-                error = re.search(r"\[Errno (\d+)]", str(exc))
+                error = ERRNO_REGEX.search(str(exc))
                 if error is not None:
-                    error_code = int(error.group(1))
-                    if error_code == 111:
+                    self.__error_code = int(error.group(1))
+                    if self.__error_code == 111:
                         self.__logger.error(
                             "Connection refused by MQTT server (%s:%i). Retrying.",
                             *host,
                         )
-                    elif error_code == -3:
+                    elif self.__error_code == -3:
                         self.__logger.error(
                             "Temporary failure in name resolution of MQTT server (%s:%i). Retrying.",
                             *host,
@@ -213,11 +383,41 @@ class MqttWriter:
                 # Catch all exceptions, log them, then try to restart the worker.
                 self.__logger.exception("Error while publishing data to MQTT broker. Reconnecting.")
 
+    async def put(self, item: tuple[datetime.datetime, tuple[DataEvent, ...]]) -> bool:
+        """
+        Queue measurements to be published. If the queue is full, the measurements are either dropped or this waits
+        until the publishers have caught up, depending on `drop_on_full`.
+
+        Parameters
+        ----------
+        item: tuple of datetime and tuple of DataEvent
+            The timestamp and the measurements
+
+        Returns
+        -------
+        bool
+            False if the measurements were dropped, True otherwise
+
+        Raises
+        ------
+        EndpointError
+            Raised if the consumer has stopped
+        """
+        assert self.__consumer_task is not None
+        if self.__drop_on_full:
+            raise_if_stopped(self.__consumer_task, "MQTT writer")
+            try:
+                self.__write_queue.put_nowait(item)
+            except asyncio.QueueFull:
+                return False
+            return True
+        await put_while_running(self.__write_queue, self.__consumer_task, item, "MQTT writer")
+        return True
+
     async def __aenter__(self) -> asyncio.Queue:
         self.__logger.info("Initializing MQTT writer")
 
-        consumers = {asyncio.create_task(self._consumer()) for _ in range(self.__number_of_workers)}
-        self.__running_tasks.update(consumers)
+        self.__consumer_task = asyncio.create_task(self._consumer())
 
         return self.__write_queue
 
@@ -232,7 +432,12 @@ class MqttWriter:
         except asyncio.TimeoutError:
             self.__logger.error("Timeout while flushing the MQTT writer.")
 
-        # Stop running tasks
-        for task in self.__running_tasks:
-            task.cancel()
+        # Stop the consumer and wait for it to disconnect from the broker
+        if self.__consumer_task is not None:
+            self.__consumer_task.cancel()
+            results = await asyncio.gather(self.__consumer_task, return_exceptions=True)
+            self.__consumer_task = None
+            for result in results:
+                if isinstance(result, Exception):
+                    self.__logger.error("Error during shutdown of the MQTT writer", exc_info=result)
         self.__logger.info("MQTT endpoint at '%s' closed.", self.__mqtt_params.hosts)
@@ -0,0 +1,68 @@
+"""
+Helpers to feed the queues of the endpoints, that are drained by a background task.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from errors import EndpointError
+
+
+def raise_if_stopped(worker: asyncio.Task, name: str) -> None:
+    """
+    Raise an error if the background task, that drains the queue of an endpoint, has stopped.
+
+    Parameters
+    ----------
+    worker: asyncio.Task
+        The task draining the queue
+    name: str
+        The name of the endpoint used in the error message
+
+    Raises
+    ------
+    EndpointError
+        Raised if the task is done. The error of the task, if any, is chained.
+    """
+    if worker.done():
+        exc = None if worker.cancelled() else worker.exception()
+        raise EndpointError(f"The {name} has stopped. Its queue is no longer processed.") from exc
+
+
+async def put_while_running(queue: asyncio.Queue, worker: asyncio.Task, item: Any, name: str) -> None:
+    """
+    Put an item into the queue of an endpoint and wait for a free slot if necessary. Unlike `queue.put()`, this does not
+    wait forever if the background task, that drains the queue, stops.
+
+    Parameters
+    ----------
+    queue: asyncio.Queue
+        The queue of the endpoint
+    worker: asyncio.Task
+        The task draining the queue
+    item: Any
+        The item to put into the queue
+    name: str
+        The name of the endpoint used in the error message
+
+    Raises
+    ------
+    EndpointError
+        Raised if the task is done or stops while waiting for a free slot
+    """
+    raise_if_stopped(worker, name)
+    if not queue.full():
+        queue.put_nowait(item)
+        return
+
+    put_task = asyncio.create_task(queue.put(item))
+    try:
+        await asyncio.wait((put_task, worker), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        put_task.cancel()  # Does nothing if the item was queued
+    if put_task.done() and not put_task.cancelled():
+        return
+    # The put is still waiting, so the worker has stopped
+    raise_if_stopped(worker, name)
@@ -1,3 +1,5 @@
+from collections.abc import Mapping
+from types import MappingProxyType
 from typing import Any
 
 from errors import UnknownDriverError
@@ -8,6 +10,13 @@ class DriverFactory:
     A logger factory to select the correct driver for given logger config.
     """
 
+    @property
+    def drivers(self) -> Mapping[str, Any]:
+        """
+        Returns a read-only view of the registered drivers, mapping the driver name to the driver class.
+        """
+        return MappingProxyType(self.__available_drivers)
+
     def __init__(self):
         self.__available_drivers = {}
 
@@ -50,9 +59,8 @@ class DriverFactory:
         ValueError
             Raised if the device driver is not registered
         """
-        try:
-            device = self.__available_drivers[driver]
-        except KeyError:
-            raise UnknownDriverError(f"No driver available for {driver}") from None
+        device = self.__available_drivers.get(driver)
+        if device is None:
+            raise UnknownDriverError(f"No driver available for {driver}")
 
         return device(**kwargs)
@@ -20,8 +20,9 @@ from __future__ import annotations
 import asyncio
 import logging
 import struct
-from dataclasses import dataclass
-from datetime import UTC, datetime, timezone
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
 from decimal import Decimal
 from typing import Any
 from uuid import UUID
@@ -45,8 +46,16 @@ from devices import (
     Keysight34470A,
 )
 
+_LOG = logging.getLogger(__name__)
 
-@dataclass(frozen=True)
+# The Keithley 2002 returns its readings as 8 byte doubles (:FORM:DATA REAL,64) in little-endian byte order
+# (:FORM:BORD SWAP, the default)
+_UNPACK_DOUBLE = struct.Struct("<d").unpack
+# Rounds the LDT5948 temperature setpoint to three decimal places
+_Q_MILLI = Decimal("1.000")
+
+
+@dataclass(frozen=True, slots=True)
 class DataEvent:
     """
     The base class to encapsulate any data event.
@@ -57,7 +66,17 @@ class DataEvent:
     topic: str
     value: Any
     unit: str
-    timestamp: datetime = datetime.now(timezone.utc)
+    timestamp: int = field(default_factory=time.time_ns)  # nanoseconds since the epoch
+
+    @property
+    def utc_datetime(self) -> datetime:
+        """
+        Returns
+        -------
+        datetime
+            The timestamp as a timezone aware datetime in UTC
+        """
+        return datetime.fromtimestamp(self.timestamp / 1e9, UTC)
 
     def __str__(self):
         return str(self.value)
@@ -108,19 +127,25 @@ class LoggingDevice:
         self.__initial_commands = [] if initial_commands is None else initial_commands
         self.__post_read_commands = [] if post_read_commands is None else post_read_commands
         self.__base_topic = base_topic if base_topic is not None else ""
-        self.__logger = logging.getLogger(__name__)
 
-    @staticmethod
-    async def __batch_run(coros, timeout=1):
+    async def __batch_run(self, commands, timeout=1):
         """
-        Execute coros in order with a timeout
+        Write the commands to the device in order. The whole batch must finish within `timeout` seconds times the
+        number of commands.
         """
-        for coro in coros:
-            await asyncio.wait_for(coro, timeout=timeout)
+        if not commands:
+            return
+
+        # A single timeout for the whole batch instead of one per command. The commands are written one after another,
+        # because the order matters, e.g. "*RST" must come before the configuration.
+        async with asyncio.timeout(timeout * len(commands)):
+            # Create the coroutines one by one, so none are left unawaited if the batch is aborted
+            for cmd in commands:
+                await self.__device.write(cmd)
 
     async def connect(self):
         await self.__device.connect()
-        self.__logger.debug("Device %s connected", self.__device)
+        _LOG.debug("Device %s connected", self.__device)
         await self.initialize()
 
     async def disconnect(self):
@@ -131,10 +156,10 @@ class LoggingDevice:
 
     async def initialize(self):
         device_id = await self.get_id()
-        self.__logger.info("Initializing %s", device_id)
+        _LOG.info("Initializing %s", device_id)
         if self.__device_name is None:
             self.__device_name = device_id
-        await self.__batch_run([self.__device.write(cmd) for cmd in self.__initial_commands])
+        await self.__batch_run(self.__initial_commands)
 
     async def get_log_header(self):
         return ""
@@ -143,11 +168,14 @@ class LoggingDevice:
         """
         Must be implemented to return a list/tuple of strings to be inserted into the log
         """
-        self.__logger.debug("Reading %s...", self.__device_name)
+        if _LOG.isEnabledFor(logging.DEBUG):
+            _LOG.debug("Reading %s...", self.__device_name)
         return ()
 
     async def post_read(self):
-        await self.__batch_run([self.__device.write(cmd) for cmd in self.__post_read_commands])
+        if not self.__post_read_commands:
+            return  # Most devices do not have any post-read commands, so skip the batch setup on each read
+        await self.__batch_run(self.__post_read_commands)
 
 
 class GenericLogger(LoggingDevice):
@@ -302,6 +330,10 @@ class LDT5948Logger(LoggingDevice):
         )
         device = LDT5948(connection)
         super().__init__(device, *args, **kwargs)
+        self.__topic_temperature = self.base_topic + "/temperature"
+        self.__topic_current = self.base_topic + "/tec_current"
+        self.__topic_voltage = self.base_topic + "/tec_voltage"
+        self.__topic_setpoint = self.base_topic + "/setpoint"
 
     async def get_log_header(self):
         (
@@ -310,8 +342,9 @@ class LDT5948Logger(LoggingDevice):
             kd,
         ) = await self.device.get_pid_constants()  # pylint: disable=invalid-name
         uptime = await self.device.query("TIME?")
+        device_id = await self.device.get_id()
 
-        return f"LDT5948 {await self.device.get_id()}; PID constants Kp={kp:.2f}; Ki={ki:.3f}; Kd={kd:.3f}; Uptime={uptime}"
+        return f"LDT5948 {device_id}; PID constants Kp={kp:.2f}; Ki={ki:.3f}; Kd={kd:.3f}; Uptime={uptime}"
 
     async def read(self) -> tuple[DataEvent, DataEvent, DataEvent, DataEvent]:
         await super().read()
@@ -325,34 +358,34 @@ class LDT5948Logger(LoggingDevice):
             self.device.read_voltage(),
             self.device.get_temperature_setpoint(),
         )
-        setpoint = setpoint.quantize(Decimal("1.000"))
+        setpoint = setpoint.quantize(_Q_MILLI)
 
         return (
             DataEvent(
                 sender=self.uuid,
                 sid=0,
-                topic=self.base_topic + "/temperature",
+                topic=self.__topic_temperature,
                 value=temperature,
                 unit="°C",
             ),
             DataEvent(
                 sender=self.uuid,
                 sid=1,
-                topic=self.base_topic + "/tec_current",
+                topic=self.__topic_current,
                 value=current,
                 unit="A",
             ),
             DataEvent(
                 sender=self.uuid,
                 sid=2,
-                topic=self.base_topic + "/tec_voltage",
+                topic=self.__topic_voltage,
                 value=voltage,
                 unit="V",
             ),
             DataEvent(
                 sender=self.uuid,
                 sid=3,
-                topic=self.base_topic + "/setpoint",
+                topic=self.__topic_setpoint,
                 value=setpoint,
                 unit="°C",
             ),
@@ -380,30 +413,13 @@ class Keithley2002Logger(LoggingDevice):
         cal_date, cal_due_date = await self.device.get_cal_data()
         return f"K2002 Cal date={cal_date}; Next Cal due={cal_due_date}"
 
-    async def query_channel(self, channel) -> DataEvent:
-        await self.device.write(f":rout:clos (@{channel+1})")
-        data = await self.device.query(":DATA:FRESh?", length=8)  # get a *new* 8 byte double from the instrument
-        try:
-            # The result of unpack is always a tuple, but we need only the first element
-            (data,) = struct.unpack("d", data)
-        except struct.error as exc:
-            raise ValueError(f"Device returned invalid data {data}.") from exc
-        return DataEvent(
-            sender=self.uuid,
-            sid=channel,
-            topic=self.base_topic + f"/channel{channel+1}",
-            value=data,
-            unit="V",
-        )
-
     async def read(self) -> tuple[DataEvent, ...]:
         await super().read()
         data = await self.device.query(":DATA:FRESh?", length=8)  # get a *new* 8 byte double from the instrument
-        try:
-            # The result of unpack is always a tuple, but we need only the first element
-            (data,) = struct.unpack("d", data)
-        except struct.error as exc:
-            raise ValueError(f"Device returned invalid data {data}.") from exc
+        if len(data) != 8:
+            raise ValueError(f"Device returned invalid data {data!r}.")
+        # The result of unpack is always a tuple, but we need only the first element
+        (data,) = _UNPACK_DOUBLE(data)
         return (DataEvent(sender=self.uuid, sid=0, topic=self.base_topic, value=data, unit=""),)
 
 
@@ -425,8 +441,29 @@ class Keithley2002ScannerLogger(Keithley2002Logger):
             **kwargs,
         )
         self.__active_channels = active_channels
+        # Close the channel and get a *new* 8 byte double from the instrument using a single compound command
+        self.__channels: dict[int, tuple[str, str]] = {
+            channel: (f":rout:clos (@{channel+1});:DATA:FRESh?", self.base_topic + f"/channel{channel+1}")
+            for channel in active_channels
+        }
+
+    async def query_channel(self, channel) -> DataEvent:
+        query, topic = self.__channels[channel]
+        data = await self.device.query(query, length=8)
+        if len(data) != 8:
+            raise ValueError(f"Device returned invalid data {data!r}.")
+        # The result of unpack is always a tuple, but we need only the first element
+        (data,) = _UNPACK_DOUBLE(data)
+        return DataEvent(
+            sender=self.uuid,
+            sid=channel,
+            topic=topic,
+            value=data,
+            unit="V",
+        )
 
     async def read(self) -> tuple[DataEvent, ...]:
+        # Scan the channels strictly one after another, so that an error stops the scan right away
         # pylint: disable=consider-using-generator
         return tuple([await self.query_channel(channel) for channel in self.__active_channels])
 
@@ -480,23 +517,32 @@ class TinkerforgeLogger(LoggingDevice):
         else:
             device = BrickletHumidityV2(base58decode(uid), ipcon)
         super().__init__(device, *args, **kwargs)
+        self.__topic_humidity = self.base_topic + "/humidity"
+
+    async def __reconnect(self) -> None:
+        try:
+            await self.device.connect()
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            _LOG.exception("Error during re-connect attempt to Tinkerforge Brick daemon.")
+            raise asyncio.TimeoutError("Connection to Tinkerforge bricklet timed out. Reconnecting.") from exc
 
     # TODO: Rework TF api to be more general
     async def read(self) -> tuple[DataEvent]:
         await super().read()
+        if not self.device.ipcon.is_connected:
+            # Do not send a query, that is bound to fail, reconnect first
+            await self.__reconnect()
         try:
             value = await self.device.get_humidity()
         except ConnectionError as exc:
-            try:
-                await self.device.connect()
-            except Exception:  # pylint: disable=broad-exception-caught
-                logging.getLogger(__name__).exception("Error during re-connect attempt to Tinkerforge Brick daemon.")
+            # The connection was lost during the query
+            await self.__reconnect()
             raise asyncio.TimeoutError("Connection to Tinkerforge bricklet timed out. Reconnecting.") from exc
         return (
             DataEvent(
                 sender=self.uuid,
                 sid=0,
-                topic=self.base_topic + "/humidity",
+                topic=self.__topic_humidity,
                 value=value,
                 unit="%rH",
             ),
@@ -535,6 +581,8 @@ class Fluke1524Logger(LoggingDevice):
         )
         device = Fluke1524(connection)
         super().__init__(device, *args, **kwargs)
+        self.__topic_channel1 = self.base_topic + "/temperature/channel1"
+        self.__topic_channel2 = self.base_topic + "/temperature/channel2"
 
     # TODO: Rework API
     async def read(self) -> tuple[DataEvent, DataEvent]:
@@ -544,15 +592,15 @@ class Fluke1524Logger(LoggingDevice):
             DataEvent(
                 sender=self.uuid,
                 sid=0,
-                topic=self.base_topic + "/temperature/channel1",
-                value=Decimal(temperature1),
+                topic=self.__topic_channel1,
+                value=temperature1,
                 unit="°C",
             ),
             DataEvent(
                 sender=self.uuid,
                 sid=1,
-                topic=self.base_topic + "/temperature/channel2",
-                value=Decimal(temperature2),
+                topic=self.__topic_channel2,
+                value=temperature2,
                 unit="°C",
             ),
         )
@@ -631,6 +679,8 @@ class EE07Logger(LoggingDevice):
         )
         device = EE07(connection)
         super().__init__(device, *args, **kwargs)
+        self.__topic_humidity = self.base_topic + "/humidity"
+        self.__topic_temperature = self.base_topic + "/temperature"
 
     async def read(self) -> tuple[DataEvent, DataEvent]:
         await super().read()
@@ -639,15 +689,15 @@ class EE07Logger(LoggingDevice):
             DataEvent(
                 sender=self.uuid,
                 sid=0,
-                topic=self.base_topic + "/humidity",
-                value=Decimal(humidity),
+                topic=self.__topic_humidity,
+                value=humidity,
                 unit="%rH",
             ),
             DataEvent(
                 sender=self.uuid,
                 sid=1,
-                topic=self.base_topic + "/temperature",
-                value=Decimal(temperature),
+                topic=self.__topic_temperature,
+                value=temperature,
                 unit="°C",
             ),
         )